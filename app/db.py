@@ -7,6 +7,7 @@ import psycopg
 from psycopg.rows import dict_row
 
 from app.config import get_settings
+from ingest.db import register_json_adapters
 
 
 @contextmanager
@@ -15,6 +16,7 @@ def connection() -> Generator[psycopg.Connection, None, None]:
     settings = get_settings()
     conn = psycopg.connect(settings.database_url)
     conn.row_factory = dict_row
+    register_json_adapters(conn)
     probes = getattr(settings, "ivfflat_probes", None)
     if probes:
         with conn.cursor() as cur:
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import json
 import logging
 import os
 import shutil
@@ -16,8 +15,11 @@ from app.db import connection
 from app.services.vectorizer import backfill_loop
 
 # Assuming these are available in the pythonpath
+from ingest.chatgpt import ChatGPTAssetResolver
 from ingest.chatgpt import ingest_conversation as ingest_chatgpt
 from ingest.claude import ingest_conversation as ingest_claude
+from ingest.common import stream_json_array
+from ingest.pipeline import DEFAULT_BATCH_SIZE, ingest_batch
 
 logger = logging.getLogger(__name__)
 
@@ -37,17 +39,22 @@ def _detect_and_ingest(
         return
 
     try:
-        with open(conversations_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        if not isinstance(data, list):
-            logger.error("conversations.json is not a list")
-            return
+        # Parsed exactly as the CLIs parse it, so both paths compute the same
+        # payload checksums (orjson would round integers wider than 64 bits).
+        data = list(stream_json_array(conversations_file))
 
         if not data:
             logger.warning("Empty conversations list")
             return
 
+        if not isinstance(data[0], dict):
+            logger.error("conversations.json is not a list of conversations")
+            return
+
+        conversations = [conv for conv in data if isinstance(conv, dict)]
+        if len(conversations) < len(data):
+            logger.warning(f"Skipping {len(data) - len(conversations)} entries that are not conversations")
+
         # Detection logic
         detected_type = source_type
         if source_type == "auto":
@@ -60,22 +67,40 @@ def _detect_and_ingest(
                 logger.error("Could not auto-detect export format")
                 return
 
-        logger.info(f"Ingesting {len(data)} conversations as {detected_type}")
+        logger.info(f"Ingesting {len(conversations)} conversations as {detected_type}")
 
         # Ingest
+        # One resolver for the whole upload so the export directory is indexed once.
+        resolver = ChatGPTAssetResolver(temp_dir)
+        if detected_type == "claude":
+            source_system, id_key = "claude", "uuid"
+
+            def ingest_one(conv, checksum, _segments):
+                return ingest_claude(conn, conv, temp_dir, checksum=checksum)
+
+        else:
+            source_system, id_key = "chatgpt", "conversation_id"
+
+            def ingest_one(conv, checksum, _segments):
+                return ingest_chatgpt(conn, conv, temp_dir, checksum=checksum, resolver=resolver)
+
+        def log_failure(conv, exc):
+            # persist_document rolled back to its own savepoint, so the rest
+            # of the batch is unaffected.
+            logger.exception(f"Failed to ingest conversation {conv.get(id_key)}: {exc}")
+
         with connection() as conn:
-            for i, conv in enumerate(data):
-                try:
-                    if detected_type == "claude":
-                        ingest_claude(conn, conv, temp_dir)
-                    elif detected_type == "chatgpt":
-                        ingest_chatgpt(conn, conv, temp_dir)
-
-                    # Commit per conversation to match CLI behavior
-                    conn.commit()
-                except Exception as e:
-                    logger.exception(f"Failed to ingest conversation {i}: {e}")
-                    conn.rollback()
+            # Commit in batches to match CLI behavior; conversations already
+            # stored with the same payload are skipped before building segments.
+            for start in range(0, len(conversations), DEFAULT_BATCH_SIZE):
+                ingest_batch(
+                    conn,
+                    source_system,
+                    conversations[start : start + DEFAULT_BATCH_SIZE],
+                    lambda conv: conv.get(id_key),
+                    ingest_one,
+                    on_error=log_failure,
+                )
 
         logger.info("Ingestion complete")
 
@@ -2,11 +2,16 @@ from __future__ import annotations
 
 import argparse
 import json
+import mmap
 import os
+import re
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 
 import psycopg
 
@@ -15,9 +20,16 @@ try:
 except ImportError:  # pragma: no cover - optional dependency
     load_dotenv = None
 
-from ingest.db import PersistResult
+from ingest.common import load_json
+from ingest.db import PersistResult, connect, fetch_version_checksums
 from ingest.models import SegmentAssetInput, SegmentInput
-from ingest.pipeline import ParsedDocument, ingest_document
+from ingest.pipeline import (
+    DEFAULT_BATCH_SIZE,
+    IngestProgress,
+    ParsedDocument,
+    ingest_batch,
+    ingest_document,
+)
 
 
 ATTACHMENT_KEYS = {
@@ -26,12 +38,103 @@ ATTACHMENT_KEYS = {
     "driveVideo": "file",
     "driveAudio": "file",
 }
+_ATTACHMENT_KEY_SET = frozenset(ATTACHMENT_KEYS)
+
+# Anything str.isalnum() rejects; \W alone would keep underscores.
+_NON_ALNUM_RE = re.compile(r"[\W_]")
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+# Same pattern for NUL-joined batches: a tag never spans the separator, so
+# a stray '<' in one message cannot match into the next.
+_HTML_BATCH_TAG_RE = re.compile(r"<[^>\x00]+>")
+_HTML_BATCH_SEPARATOR = "\x00"
+
+
+SOURCE_SYSTEM = "other"
+DEFAULT_CACHE_PATH = "~/.cache/2brain/aistudio.sqlite"
+# Files larger than this are parsed straight from an mmap of the page cache.
+MMAP_THRESHOLD_BYTES = 1_000_000
 
 
 @dataclass
 class ConversationFile:
     path: Path
     payload: dict | list
+    mtime: float
+
+
+class IngestCache:
+    """
+    On-disk record of files already ingested, keyed by path, mtime and size.
+
+    A hit only says the file has not changed since we stored its checksum; the
+    caller still confirms the checksum exists in the database before skipping.
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path))
+        try:
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    sha256 BLOB NOT NULL
+                )
+                """
+            )
+        except sqlite3.Error:
+            self._db.close()
+            raise
+        self._stats: Dict[str, os.stat_result] = {}
+
+    def lookup(self, entry: os.DirEntry) -> Optional[bytes]:
+        """Return the cached checksum when the file is unchanged since it was stored."""
+        try:
+            stats = entry.stat()
+        except OSError:
+            return None
+        self._stats[entry.path] = stats
+        row = self._db.execute(
+            "SELECT mtime_ns, size, sha256 FROM files WHERE path = ?",
+            (entry.path,),
+        ).fetchone()
+        if row is None or row[0] != stats.st_mtime_ns or row[1] != stats.st_size:
+            return None
+        return bytes(row[2])
+
+    def store(self, path: Path, checksum: bytes) -> None:
+        stats = self._stats.get(str(path))
+        if stats is None:
+            try:
+                stats = path.stat()
+            except OSError:
+                return
+        self._db.execute(
+            "INSERT OR REPLACE INTO files (path, mtime_ns, size, sha256) VALUES (?, ?, ?, ?)",
+            (str(path), stats.st_mtime_ns, stats.st_size, checksum),
+        )
+
+    def commit(self) -> None:
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def _cache_path() -> Path:
+    return Path(os.environ.get("AISTUDIO_INGEST_CACHE", DEFAULT_CACHE_PATH)).expanduser()
+
+
+def _open_cache() -> Optional[IngestCache]:
+    """Open the ingest cache, or return None (ingesting every file) when it is unusable."""
+    path = _cache_path()
+    try:
+        return IngestCache(path)
+    except (OSError, sqlite3.Error) as exc:
+        print(f"Warning: ingest cache {path} unavailable ({exc}); continuing without it.", file=sys.stderr)
+        return None
 
 
 def timezone_from_timestamp(ts: Optional[float]) -> datetime:
@@ -40,25 +143,73 @@ def timezone_from_timestamp(ts: Optional[float]) -> datetime:
     return datetime.fromtimestamp(ts, tz=timezone.utc)
 
 
-def discover_conversations(root: Path) -> List[ConversationFile]:
-    conversations: List[ConversationFile] = []
-    for path in root.rglob("*"):
-        if not path.is_file():
-            continue
-        try:
-            text = path.read_text(encoding="utf-8")
-        except (UnicodeDecodeError, OSError):
-            continue
+def _list_files(root: Path) -> Iterator[os.DirEntry]:
+    """Yield regular files under root, walking directories with os.scandir."""
+    stack = [str(root)]
+    while stack:
         try:
-            data = json.loads(text)
-        except json.JSONDecodeError:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            yield entry
+                    except OSError:
+                        continue
+        except OSError:
             continue
-        if not isinstance(data, dict):
-            continue
-        if "chunkedPrompt" not in data or "runSettings" not in data:
-            continue
-        conversations.append(ConversationFile(path=path, payload=data))
-    return conversations
+
+
+def _parse_one(path: str) -> Optional[ConversationFile]:
+    """Load a single file, returning it only if it looks like an AI Studio conversation."""
+    try:
+        with open(path, "rb") as fh:
+            stats = os.fstat(fh.fileno())
+            mtime = stats.st_mtime
+            if stats.st_size > MMAP_THRESHOLD_BYTES:
+                with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    with memoryview(mapped) as view:
+                        data = load_json(view)
+            else:
+                data = load_json(fh.read())
+    except (OSError, UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    if "chunkedPrompt" not in data or "runSettings" not in data:
+        return None
+    return ConversationFile(path=Path(path), payload=data, mtime=mtime)
+
+
+def _load_conversations(files: List[os.DirEntry]) -> List[ConversationFile]:
+    if not files:
+        return []
+    # JSON parsing is CPU-bound, so fan the files out across processes.
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(_parse_one, [entry.path for entry in files], chunksize=32)
+        return [conversation for conversation in results if conversation is not None]
+
+
+def _skip_unchanged(
+    conn: psycopg.Connection,
+    cache: IngestCache,
+    root: Path,
+    files: List[os.DirEntry],
+) -> tuple[List[os.DirEntry], int]:
+    """Drop files whose cached checksum is already stored as a document version."""
+    candidates: Dict[str, tuple[str, bytes]] = {}
+    for entry in files:
+        checksum = cache.lookup(entry)
+        if checksum is not None:
+            candidates[normalize_external_id(root, Path(entry.path))] = (entry.path, checksum)
+    stored = fetch_version_checksums(conn, SOURCE_SYSTEM, candidates)
+    unchanged = {
+        path
+        for external_id, (path, checksum) in candidates.items()
+        if (external_id, checksum) in stored
+    }
+    return [entry for entry in files if entry.path not in unchanged], len(unchanged)
 
 
 def normalize_external_id(root: Path, file_path: Path) -> str:
@@ -70,8 +221,7 @@ def normalize_external_id(root: Path, file_path: Path) -> str:
 
 
 def slugify(text: str) -> str:
-    sanitized = [ch if ch.isalnum() else "-" for ch in text]
-    slug = "".join(sanitized).strip("-")
+    slug = _NON_ALNUM_RE.sub("-", text).strip("-")
     return slug or "conversation"
 
 
@@ -95,23 +245,26 @@ def build_segments(conversation: dict, conversation_id: str) -> List[SegmentInpu
         role = normalize_role(chunk.get("role"))
         attachments: List[SegmentAssetInput] = []
         attachment_placeholders: List[str] = []
-        for key, asset_type in ATTACHMENT_KEYS.items():
-            if key not in chunk:
-                continue
-            entry = chunk[key] or {}
-            drive_id = entry.get("id") or "unknown"
-            source_reference = f"{key}:{drive_id}"
-            attachments.append(
-                SegmentAssetInput(
-                    asset_type=asset_type,
-                    source_reference=source_reference,
-                    file_name=None,
-                    mime_type=None,
-                    size_bytes=None,
-                    local_path=None,
+        # Most chunks carry no attachment, so test all keys at once before
+        # walking ATTACHMENT_KEYS in its fixed order.
+        if not _ATTACHMENT_KEY_SET.isdisjoint(chunk):
+            for key, asset_type in ATTACHMENT_KEYS.items():
+                if key not in chunk:
+                    continue
+                entry = chunk[key] or {}
+                drive_id = entry.get("id") or "unknown"
+                source_reference = f"{key}:{drive_id}"
+                attachments.append(
+                    SegmentAssetInput(
+                        asset_type=asset_type,
+                        source_reference=source_reference,
+                        file_name=None,
+                        mime_type=None,
+                        size_bytes=None,
+                        local_path=None,
+                    )
                 )
-            )
-            attachment_placeholders.append(f"[{asset_type.upper()} attachment: {drive_id}]")
+                attachment_placeholders.append(f"[{asset_type.upper()} attachment: {drive_id}]")
 
         text_content: Optional[str] = chunk.get("text")
         if text_content:
@@ -149,16 +302,22 @@ def build_segments(conversation: dict, conversation_id: str) -> List[SegmentInpu
     return segments
 
 
+def _strip_html_tags(htmls: List[str]) -> List[str]:
+    """Replace tags with spaces across many HTML strings in a single regex pass."""
+    if len(htmls) < 2 or any(_HTML_BATCH_SEPARATOR in html for html in htmls):
+        return [_HTML_TAG_RE.sub(" ", html) for html in htmls]
+    joined = _HTML_BATCH_SEPARATOR.join(htmls)
+    return _HTML_BATCH_TAG_RE.sub(" ", joined).split(_HTML_BATCH_SEPARATOR)
+
+
 def build_segments_from_simple_list(messages: List[dict], conversation_id: str) -> List[SegmentInput]:
     """Fallback for simple exports that are just a list of {role, content_html} dicts."""
-    import re
-
     segments: List[SegmentInput] = []
-    tag_re = re.compile(r"<[^>]+>")
-    for idx, msg in enumerate(messages, start=1):
+    htmls = [msg.get("content_html") or "" for msg in messages]
+    stripped = _strip_html_tags(htmls)
+    for idx, (msg, html, text) in enumerate(zip(messages, htmls, stripped), start=1):
         role = normalize_role(msg.get("role"))
-        html = msg.get("content_html") or ""
-        plaintext = tag_re.sub(" ", html).strip()
+        plaintext = text.strip()
         segments.append(
             SegmentInput(
                 node_id=f"{conversation_id}-{idx}",
@@ -214,12 +373,12 @@ def ingest_conversation(
     conn: psycopg.Connection,
     conversation: ConversationFile,
     root: Path,
+    *,
+    checksum: bytes | None = None,
 ) -> PersistResult:
     path = conversation.path
     payload = conversation.payload
-    stat_target = path if path.exists() else root
-    stats = stat_target.stat()
-    timestamps = timezone_from_timestamp(stats.st_mtime)
+    timestamps = timezone_from_timestamp(conversation.mtime)
     title = path.name
     external_id = normalize_external_id(root, path)
     conversation_id = slugify(external_id)
@@ -246,7 +405,7 @@ def ingest_conversation(
     }
 
     parsed_doc = ParsedDocument(
-        source_system="other",
+        source_system=SOURCE_SYSTEM,
         external_id=external_id,
         title=title,
         summary=None,
@@ -265,17 +424,10 @@ def ingest_conversation(
         ingested_by=os.getenv("INGESTED_BY") or os.getenv("USER"),
         ingest_source="google",
         ingest_version=os.getenv("INGEST_VERSION"),
+        checksum=checksum,
     )
 
 
-def _print_progress(stats: Dict[str, int], current: Path) -> None:
-    message = (
-        f"new: {stats['new']} | updated: {stats['updated']} | "
-        f"unchanged: {stats['unchanged']} | {current.name}"
-    )
-    print(f"\r{message}\x1b[K", end="", flush=True)
-
-
 def run_cli() -> None:
     parser = argparse.ArgumentParser(description="Ingest Google AI Studio exports into the Tiger database.")
     parser.add_argument(
@@ -302,6 +454,11 @@ def run_cli() -> None:
         default=None,
         help="Optional path to a .env file to load before connecting.",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore the on-disk cache of previously ingested files (AISTUDIO_INGEST_CACHE).",
+    )
     args = parser.parse_args()
 
     if load_dotenv and args.env_file:
@@ -317,52 +474,60 @@ def run_cli() -> None:
     if export_dir is None:
         parser.error("Provide the export path (file or directory) as a positional argument or via --export.")
     export_dir = export_dir.expanduser().resolve()
-    if export_dir.is_file():
-        try:
-            payload = json.loads(export_dir.read_text(encoding="utf-8"))
-        except Exception as exc:  # pragma: no cover - defensive
-            raise RuntimeError(f"Failed to read JSON export file {export_dir}") from exc
-        conversations: List[ConversationFile] = []
-        if isinstance(payload, list):
-            # Wrap list payload as a single conversation; parsed later by list-aware logic.
-            conversations = [ConversationFile(path=export_dir, payload=payload)]
-        elif isinstance(payload, dict):
-            conversations = [ConversationFile(path=export_dir, payload=payload)]
-        else:
-            raise RuntimeError(f"Unsupported JSON payload shape in {export_dir}")
-    elif export_dir.is_dir():
-        conversations = discover_conversations(export_dir)
-    else:
+    if not export_dir.exists():
         raise FileNotFoundError(f"Export path {export_dir} was not found.")
-    if args.limit is not None:
-        conversations = conversations[: args.limit]
 
-    stats = {"new": 0, "updated": 0, "unchanged": 0}
-    with psycopg.connect(dsn) as conn:
-        ingested = 0
-        for conv in conversations:
+    progress = IngestProgress(lambda conv: conv.path.name)
+    cache = _open_cache() if export_dir.is_dir() and not args.no_cache else None
+    with connect(dsn) as conn:
+        if export_dir.is_file():
             try:
-                result = ingest_conversation(conn, conv, export_dir)
-                conn.commit()
-            except Exception:
-                conn.rollback()
-                raise
-
-            if not result.version_created:
-                stats["unchanged"] += 1
-            elif result.document_created:
-                stats["new"] += 1
+                payload = load_json(export_dir.read_bytes())
+            except Exception as exc:  # pragma: no cover - defensive
+                raise RuntimeError(f"Failed to read JSON export file {export_dir}") from exc
+            mtime = export_dir.stat().st_mtime
+            conversations: List[ConversationFile] = []
+            if isinstance(payload, list):
+                # Wrap list payload as a single conversation; parsed later by list-aware logic.
+                conversations = [ConversationFile(path=export_dir, payload=payload, mtime=mtime)]
+            elif isinstance(payload, dict):
+                conversations = [ConversationFile(path=export_dir, payload=payload, mtime=mtime)]
             else:
-                stats["updated"] += 1
-
-            ingested += 1
-            _print_progress(stats, conv.path)
-
-    print("\r" + " " * 120 + "\r", end="")
-    print(
-        f"Ingested {ingested} conversation(s) from {export_dir} | "
-        f"new: {stats['new']} updated: {stats['updated']} unchanged: {stats['unchanged']}"
-    )
+                raise RuntimeError(f"Unsupported JSON payload shape in {export_dir}")
+        else:
+            files = list(_list_files(export_dir))
+            if cache is not None:
+                files, progress.stats["unchanged"] = _skip_unchanged(conn, cache, export_dir, files)
+            conversations = _load_conversations(files)
+        if args.limit is not None:
+            conversations = conversations[: args.limit]
+
+        batch_size = max(1, int(os.getenv("AISTUDIO_BATCH", DEFAULT_BATCH_SIZE)))
+        try:
+            for start in range(0, len(conversations), batch_size):
+                batch = conversations[start : start + batch_size]
+                outcomes = ingest_batch(
+                    conn,
+                    SOURCE_SYSTEM,
+                    batch,
+                    lambda conv: normalize_external_id(export_dir, conv.path),
+                    lambda conv, checksum, _: ingest_conversation(
+                        conn, conv, export_dir, checksum=checksum
+                    ),
+                    payload=lambda conv: conv.payload,
+                )
+                for conv, (checksum, result) in zip(batch, outcomes):
+                    if cache is not None:
+                        cache.store(conv.path, checksum)
+
+                    progress.record(conv, result)
+                if cache is not None:
+                    cache.commit()
+        finally:
+            if cache is not None:
+                cache.close()
+
+    progress.finish(export_dir)
 
 
 if __name__ == "__main__":
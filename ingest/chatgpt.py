@@ -1,12 +1,12 @@
 from __future__ import annotations
 
 import argparse
-import json
-import mimetypes
 import os
 from datetime import datetime, timezone
+from itertools import islice
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 
 import psycopg
 
@@ -15,40 +15,60 @@ try:
 except ImportError:  # pragma: no cover - optional dependency
     load_dotenv = None
 
-
-from ingest.db import PersistResult
-from ingest.pipeline import ParsedDocument, ingest_document
+from ingest.common import guess_mime_type, payload_checksum, stream_json_array
+from ingest.db import PersistResult, connect
+from ingest.pipeline import (
+    DEFAULT_BATCH_SIZE,
+    IngestProgress,
+    ParsedDocument,
+    ingest_batch,
+    ingest_document,
+    iter_prepared_batches,
+)
 from ingest.models import SegmentAssetInput, SegmentBlockInput, SegmentInput
 
 
+
 class ChatGPTAssetResolver:
+    # Asset tokens look like "file-<id>"; indexing on this many leading
+    # characters leaves only a handful of candidates per bucket.
+    PREFIX_LEN = 16
+
     def __init__(self, export_dir: Path) -> None:
         self.export_dir = export_dir
         self._cache: Dict[str, Optional[Path]] = {}
+        self._files: Optional[List[Path]] = None
+        self._by_prefix: Dict[str, List[Path]] = {}
+
+    def _build_index(self) -> List[Path]:
+        # List the directory once, already in preference order (sanitized
+        # copies first, then shortest name), so the first prefix match wins.
+        files = sorted(
+            (path for path in self.export_dir.iterdir() if path.is_file()),
+            key=lambda p: (0 if "sanitized" in p.name else 1, len(p.name)),
+        )
+        for path in files:
+            self._by_prefix.setdefault(path.name[: self.PREFIX_LEN], []).append(path)
+        self._files = files
+        return files
 
     def resolve(self, pointer: str) -> Optional[Path]:
         if pointer in self._cache:
             return self._cache[pointer]
         token = pointer.split("://", 1)[1] if "://" in pointer else pointer
-        matches = sorted(
-            [
-                path
-                for path in self.export_dir.iterdir()
-                if path.is_file() and path.name.startswith(token)
-            ],
-            key=lambda p: (0 if "sanitized" in p.name else 1, len(p.name)),
-        )
-        resolved = matches[0] if matches else None
+        files = self._files if self._files is not None else self._build_index()
+        if len(token) >= self.PREFIX_LEN:
+            files = self._by_prefix.get(token[: self.PREFIX_LEN], [])
+        resolved = next((path for path in files if path.name.startswith(token)), None)
         self._cache[pointer] = resolved
         return resolved
 
 
-def load_conversations(export_dir: Path) -> List[dict]:
+def load_conversations(export_dir: Path) -> Iterator[dict]:
     conversations_path = export_dir / "conversations.json"
     if not conversations_path.exists():
         raise FileNotFoundError(f"No conversations.json found under {export_dir}")
-    with conversations_path.open("r", encoding="utf-8") as fh:
-        return json.load(fh)
+    return stream_json_array(conversations_path)
 
 
 def to_datetime(epoch: Optional[float]) -> Optional[datetime]:
@@ -62,16 +82,34 @@ def collect_segments(conversation: dict, resolver: ChatGPTAssetResolver) -> List
     roots = [node_id for node_id, node in mapping.items() if node.get("parent") is None]
     segments: List[SegmentInput] = []
 
+    nearest_cache: Dict[str, Optional[str]] = {}
+
     def nearest_parent_with_message(node_id: Optional[str]) -> Optional[str]:
+        # Remember the answer for every node on the walk so each parent
+        # chain is climbed once per conversation, not once per descendant.
+        walked: List[str] = []
         current = node_id
+        answer: Optional[str] = None
         while current:
+            if current in nearest_cache:
+                answer = nearest_cache[current]
+                break
+            walked.append(current)
             node = mapping[current]
             if node.get("message"):
-                return current
+                answer = current
+                break
             current = node.get("parent")
-        return None
-
-    def visit(node_id: str) -> None:
+        for visited in walked:
+            nearest_cache[visited] = answer
+        return answer
+
+    # Explicit stack instead of recursion: long branches would otherwise hit
+    # the interpreter's recursion limit. Children are pushed in reverse so
+    # segments come out in the same pre-order as before.
+    stack = list(reversed(roots))
+    while stack:
+        node_id = stack.pop()
         node = mapping[node_id]
         message = node.get("message")
         segment_parent_node_id = nearest_parent_with_message(node.get("parent"))
@@ -84,11 +122,7 @@ def collect_segments(conversation: dict, resolver: ChatGPTAssetResolver) -> List
                 resolver=resolver,
             )
             segments.append(segment)
-        for child_id in node.get("children") or []:
-            visit(child_id)
-
-    for root in roots:
-        visit(root)
+        stack.extend(reversed(node.get("children") or []))
     return segments
 
 
@@ -128,9 +162,7 @@ def build_segment(
         resolved_path = resolver.resolve(pointer) if pointer else None
         asset_type = "image" if "image" in content_type else "file"
         local_path = str(resolved_path) if resolved_path else None
-        mime_type = None
-        if resolved_path:
-            mime_type, _ = mimetypes.guess_type(resolved_path.name)
+        mime_type = guess_mime_type(resolved_path.name) if resolved_path else None
         assets.append(
             SegmentAssetInput(
                 asset_type=asset_type,
@@ -162,13 +194,30 @@ def build_segment(
     )
 
 
+@lru_cache(maxsize=1)
+def _process_resolver(export_dir: Path) -> ChatGPTAssetResolver:
+    # Each worker process indexes the export directory once, not per conversation.
+    return ChatGPTAssetResolver(export_dir)
+
+
+def prepare_conversation(conversation: dict, export_dir: Path) -> tuple[bytes, List[SegmentInput]]:
+    """Checksum and segments for one conversation; runs in a worker under --workers."""
+    return payload_checksum(conversation), collect_segments(conversation, _process_resolver(export_dir))
+
+
 def ingest_conversation(
     conn: psycopg.Connection,
     conversation: dict,
     export_dir: Path,
+    *,
+    checksum: bytes | None = None,
+    segments: List[SegmentInput] | None = None,
+    resolver: ChatGPTAssetResolver | None = None,
 ) -> PersistResult:
-    resolver = ChatGPTAssetResolver(export_dir)
-    segments = collect_segments(conversation, resolver)
+    if segments is None:
+        if resolver is None:
+            resolver = ChatGPTAssetResolver(export_dir)
+        segments = collect_segments(conversation, resolver)
 
     created_at = to_datetime(conversation.get("create_time")) or datetime.now(tz=timezone.utc)
     updated_at = to_datetime(conversation.get("update_time")) or created_at
@@ -210,17 +259,10 @@ def ingest_conversation(
         ingested_by=os.getenv("INGESTED_BY") or os.getenv("USER"),
         ingest_source="chatgpt",
         ingest_version=os.getenv("INGEST_VERSION"),
+        checksum=checksum,
     )
 
 
-def _print_progress(stats: Dict[str, int], current: str) -> None:
-    message = (
-        f"new: {stats['new']} | updated: {stats['updated']} | "
-        f"unchanged: {stats['unchanged']} | {current}"
-    )
-    print(f"\r{message}\x1b[K", end="", flush=True)
-
-
 def run_cli() -> None:
     parser = argparse.ArgumentParser(description="Ingest ChatGPT exports into the Tiger database.")
     parser.add_argument(
@@ -241,6 +283,12 @@ def run_cli() -> None:
         default=None,
         help="Optional limit on the number of conversations to ingest.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Build segments in this many worker processes (default: 1, no pool).",
+    )
     parser.add_argument(
         "--env-file",
         type=Path,
@@ -264,35 +312,37 @@ def run_cli() -> None:
     export_dir = export_dir.expanduser().resolve()
     conversations = load_conversations(export_dir)
     if args.limit is not None:
-        conversations = conversations[: args.limit]
-
-    stats = {"new": 0, "updated": 0, "unchanged": 0}
-    with psycopg.connect(dsn) as conn:
-        ingested = 0
-        for conversation in conversations:
-            try:
-                result = ingest_conversation(conn, conversation, export_dir)
-                conn.commit()
-            except Exception:
-                conn.rollback()
-                raise
-
-            if not result.version_created:
-                stats["unchanged"] += 1
-            elif result.document_created:
-                stats["new"] += 1
-            else:
-                stats["updated"] += 1
-
-            ingested += 1
-            name = conversation.get("title") or conversation.get("id") or "conversation"
-            _print_progress(stats, name)
-
-    print("\r" + " " * 120 + "\r", end="")
-    print(
-        f"Ingested {ingested} conversation(s) from {export_dir} | "
-        f"new: {stats['new']} updated: {stats['updated']} unchanged: {stats['unchanged']}"
+        conversations = islice(conversations, args.limit)
+
+    batch_size = max(1, int(os.getenv("CHATGPT_BATCH", DEFAULT_BATCH_SIZE)))
+    progress = IngestProgress(
+        lambda conversation: conversation.get("title") or conversation.get("id") or "conversation"
     )
+    with connect(dsn) as conn:
+        resolver = ChatGPTAssetResolver(export_dir)
+        prepare = partial(prepare_conversation, export_dir=export_dir)
+        for batch, prepared in iter_prepared_batches(
+            conversations, batch_size, prepare, workers=args.workers
+        ):
+            outcomes = ingest_batch(
+                conn,
+                "chatgpt",
+                batch,
+                lambda conversation: conversation["conversation_id"],
+                lambda conversation, checksum, segments: ingest_conversation(
+                    conn,
+                    conversation,
+                    export_dir,
+                    checksum=checksum,
+                    segments=segments,
+                    resolver=resolver,
+                ),
+                prepared=prepared,
+            )
+            for conversation, (_, result) in zip(batch, outcomes):
+                progress.record(conversation, result)
+
+    progress.finish(export_dir)
 
 
 if __name__ == "__main__":
@@ -2,11 +2,11 @@ from __future__ import annotations
 
 import argparse
 import json
-import mimetypes
 import os
 from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
 import psycopg
 
@@ -15,17 +15,27 @@ try:
 except ImportError:  # pragma: no cover
     load_dotenv = None
 
-from ingest.db import PersistResult
+
+from ingest.common import dumps_pretty, guess_mime_type, payload_checksum, stream_json_array
+from ingest.db import PersistResult, connect
 from ingest.models import SegmentAssetInput, SegmentBlockInput, SegmentInput
-from ingest.pipeline import ParsedDocument, ingest_document
+from ingest.pipeline import (
+    DEFAULT_BATCH_SIZE,
+    IngestProgress,
+    ParsedDocument,
+    ingest_batch,
+    ingest_document,
+    iter_prepared_batches,
+)
+
+_IMAGE_EXTS = frozenset({".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".heic", ".bmp"})
 
 
-def load_conversations(export_dir: Path) -> List[dict]:
+def load_conversations(export_dir: Path) -> Iterator[dict]:
     conversations_path = export_dir / "conversations.json"
     if not conversations_path.exists():
         raise FileNotFoundError(f"No conversations.json found under {export_dir}")
-    with conversations_path.open("r", encoding="utf-8") as fh:
-        return json.load(fh)
+    return stream_json_array(conversations_path)
 
 
 def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
@@ -47,10 +57,8 @@ def normalize_sender(sender: str) -> str:
 def determine_asset_type(file_name: str | None) -> str:
     if not file_name:
         return "file"
-    extension = Path(file_name).suffix.lower()
-    if extension in {".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".heic", ".bmp"}:
-        return "image"
-    return "file"
+    extension = os.path.splitext(file_name)[1].lower()
+    return "image" if extension in _IMAGE_EXTS else "file"
 
 
 def build_segment(message: dict, sequence: int) -> SegmentInput:
@@ -95,7 +103,7 @@ def build_segment(message: dict, sequence: int) -> SegmentInput:
                 )
             )
         elif block_type == "tool_use":
-            body = json.dumps(block.get("input"), indent=2) if block.get("input") else "{}"
+            body = dumps_pretty(block.get("input")) if block.get("input") else "{}"
             markdown = f"Tool call: {block.get('name')}\n\n```json\n{body}\n```"
             markdown_parts.append(markdown)
             plaintext_parts.append(f"[tool call {block.get('name')}]")
@@ -131,12 +139,12 @@ def build_segment(message: dict, sequence: int) -> SegmentInput:
             blocks.append(
                 SegmentBlockInput(
                     block_type="markdown",
-                    body=json.dumps(block, indent=2),
+                    body=dumps_pretty(block),
                     raw_data=block,
                 )
             )
         else:
-            text = json.dumps(block, indent=2)
+            text = dumps_pretty(block)
             markdown_parts.append(text)
             plaintext_parts.append(text)
             blocks.append(
@@ -150,7 +158,7 @@ def build_segment(message: dict, sequence: int) -> SegmentInput:
     for attachment in message.get("attachments") or []:
         file_name = attachment.get("file_name")
         asset_type = determine_asset_type(file_name)
-        mime_type, _ = mimetypes.guess_type(file_name or "")
+        mime_type = guess_mime_type(file_name)
         assets.append(
             SegmentAssetInput(
                 asset_type=asset_type,
@@ -164,7 +172,7 @@ def build_segment(message: dict, sequence: int) -> SegmentInput:
     for file_entry in message.get("files") or []:
         file_name = file_entry.get("file_name")
         asset_type = determine_asset_type(file_name)
-        mime_type, _ = mimetypes.guess_type(file_name or "")
+        mime_type = guess_mime_type(file_name)
         assets.append(
             SegmentAssetInput(
                 asset_type=asset_type,
@@ -208,8 +216,21 @@ def collect_segments(conversation: dict) -> List[SegmentInput]:
     return segments
 
 
-def ingest_conversation(conn: psycopg.Connection, conversation: dict, export_dir: Path) -> PersistResult:
-    segments = collect_segments(conversation)
+def prepare_conversation(conversation: dict) -> tuple[bytes, List[SegmentInput]]:
+    """Checksum and segments for one conversation; runs in a worker under --workers."""
+    return payload_checksum(conversation), collect_segments(conversation)
+
+
+def ingest_conversation(
+    conn: psycopg.Connection,
+    conversation: dict,
+    export_dir: Path,
+    *,
+    checksum: bytes | None = None,
+    segments: List[SegmentInput] | None = None,
+) -> PersistResult:
+    if segments is None:
+        segments = collect_segments(conversation)
     created_at = parse_timestamp(conversation.get("created_at")) or datetime.now(tz=timezone.utc)
     updated_at = parse_timestamp(conversation.get("updated_at")) or created_at
 
@@ -235,17 +256,10 @@ def ingest_conversation(conn: psycopg.Connection, conversation: dict, export_dir
         ingested_by=os.getenv("INGESTED_BY") or os.getenv("USER"),
         ingest_source="claude",
         ingest_version=os.getenv("INGEST_VERSION"),
+        checksum=checksum,
     )
 
 
-def _print_progress(stats: Dict[str, int], current: str) -> None:
-    message = (
-        f"new: {stats['new']} | updated: {stats['updated']} | "
-        f"unchanged: {stats['unchanged']} | {current}"
-    )
-    print(f"\r{message}\x1b[K", end="", flush=True)
-
-
 def run_cli() -> None:
     parser = argparse.ArgumentParser(description="Ingest Claude exports into the Tiger database.")
     parser.add_argument(
@@ -266,6 +280,12 @@ def run_cli() -> None:
         default=None,
         help="Optional limit on the number of conversations to ingest.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Build segments in this many worker processes (default: 1, no pool).",
+    )
     parser.add_argument(
         "--env-file",
         type=Path,
@@ -289,37 +309,31 @@ def run_cli() -> None:
     export_dir = export_dir.expanduser().resolve()
     conversations = load_conversations(export_dir)
     if args.limit is not None:
-        conversations = conversations[: args.limit]
-
-    stats = {"new": 0, "updated": 0, "unchanged": 0}
-    with psycopg.connect(dsn) as conn:
-        ingested = 0
-        for conversation in conversations:
-            if not conversation.get("chat_messages"):
-                continue
-            try:
-                result = ingest_conversation(conn, conversation, export_dir)
-                conn.commit()
-            except Exception:
-                conn.rollback()
-                raise
-
-            if not result.version_created:
-                stats["unchanged"] += 1
-            elif result.document_created:
-                stats["new"] += 1
-            else:
-                stats["updated"] += 1
+        conversations = islice(conversations, args.limit)
 
-            ingested += 1
-            name = conversation.get("name") or conversation.get("uuid") or "conversation"
-            _print_progress(stats, name)
-
-    print("\r" + " " * 120 + "\r", end="")
-    print(
-        f"Ingested {ingested} conversation(s) from {export_dir} | "
-        f"new: {stats['new']} updated: {stats['updated']} unchanged: {stats['unchanged']}"
+    conversations = (conversation for conversation in conversations if conversation.get("chat_messages"))
+    batch_size = max(1, int(os.getenv("CLAUDE_BATCH", DEFAULT_BATCH_SIZE)))
+    progress = IngestProgress(
+        lambda conversation: conversation.get("name") or conversation.get("uuid") or "conversation"
     )
+    with connect(dsn) as conn:
+        for batch, prepared in iter_prepared_batches(
+            conversations, batch_size, prepare_conversation, workers=args.workers
+        ):
+            outcomes = ingest_batch(
+                conn,
+                "claude",
+                batch,
+                lambda conversation: conversation["uuid"],
+                lambda conversation, checksum, segments: ingest_conversation(
+                    conn, conversation, export_dir, checksum=checksum, segments=segments
+                ),
+                prepared=prepared,
+            )
+            for conversation, (_, result) in zip(batch, outcomes):
+                progress.record(conversation, result)
+
+    progress.finish(export_dir)
 
 
 if __name__ == "__main__":
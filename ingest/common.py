@@ -2,17 +2,139 @@ from __future__ import annotations
 
 import hashlib
 import json
-import re
-from typing import Iterable, Mapping, Optional, Union
+import mimetypes
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Mapping, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - optional dependency
+    ijson = None
 
 from ingest.models import SegmentInput
 
-WHITESPACE_RE = re.compile(r"\s+")
+# Prefix of orjson's error for numbers that overflow a double ("1e400").
+_ORJSON_RANGE_ERROR = "number is infinity"
+
+# Bound once so the per-segment and per-payload hashes skip the module lookup.
+_HASH = hashlib.sha256
+
+
+def load_json(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """
+    Parse a JSON document, preferring orjson when it is installed.
+
+    orjson reads UTF-8 bytes (or any buffer, such as a memoryview over an
+    mmap) directly, so callers should pass the raw file contents rather than
+    decoding them first. Documents with numbers beyond double range, which
+    orjson rejects, are retried with the stdlib; anything else that fails
+    to parse raises at once. Both parsers raise json.JSONDecodeError
+    (orjson's error subclasses it).
+
+    orjson does not reject integers wider than 64 bits: it returns them as
+    (rounded) floats, where json.loads keeps the exact int. Use this for
+    parsing where that is acceptable; the conversation exports go through
+    stream_json_array (ijson keeps exact ints) so payload checksums and
+    stored raw payloads do not depend on the parser.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except json.JSONDecodeError as exc:
+            if _ORJSON_RANGE_ERROR not in str(exc):
+                raise
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def stream_json_array(path: Path) -> Iterator[Any]:
+    """
+    Iterate over the elements of a top-level JSON array stored in path.
+
+    With ijson installed the file is parsed incrementally, so a
+    multi-hundred-MB export never sits in memory whole; otherwise it is
+    loaded with the stdlib. Both keep integers exact (unlike orjson), and
+    use_float keeps other numbers as float (not Decimal), so payload
+    checksums are the same either way.
+    """
+    if ijson is None:
+        return iter(json.loads(path.read_bytes()))
+    return _stream_json_items(path)
+
+
+def _stream_json_items(path: Path) -> Iterator[Any]:
+    with path.open("rb") as fh:
+        yield from ijson.items(fh, "item", use_float=True)
+
+
+def dumps_json_bytes(obj: Any) -> bytes:
+    """
+    Serialize obj to compact UTF-8 JSON, preferring orjson when installed.
+
+    Intended as the dumps= callable for psycopg's Json wrapper so large
+    payloads are encoded once, in C, straight to bytes. Values orjson
+    rejects (non-str keys, integers over 64 bits) go through the stdlib.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass
+    return json.dumps(obj).encode("utf-8")
+
+
+def dumps_pretty(obj: Any) -> str:
+    """
+    Render obj as two-space indented JSON for display in markdown.
+
+    Uses orjson's single-pass indenter when available, falling back to the
+    stdlib for values orjson rejects (non-str keys, integers over 64 bits).
+    Non-ASCII text is kept as-is either way so both paths read the same.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+@lru_cache(maxsize=1024)
+def _guess_mime_for_suffix(suffix: str) -> Optional[str]:
+    return mimetypes.guess_type("x" + suffix)[0]
+
+
+def guess_mime_type(file_name: Optional[str]) -> Optional[str]:
+    """
+    Return mimetypes.guess_type(file_name)[0], cached per file suffix.
+
+    guess_type only ever looks at the last two suffixes (e.g. ".tar.gz"),
+    so those are the cache key. Names with a path, URL scheme or leading
+    dot are passed straight through since guess_type treats them specially.
+    """
+    if not file_name:
+        return None
+    if file_name[0] == "." or "/" in file_name or ":" in file_name:
+        return mimetypes.guess_type(file_name)[0]
+    last = file_name.rfind(".")
+    if last == -1:
+        return None
+    previous = file_name.rfind(".", 0, last)
+    return _guess_mime_for_suffix(file_name[previous if previous > 0 else last :])
 
 
 def normalize_markdown(markdown: str) -> str:
     """Normalize markdown for stable checksum computation."""
-    return WHITESPACE_RE.sub(" ", (markdown or "").strip())
+    # str.split() breaks on exactly the characters \s matches, so this is
+    # the old regex collapse without the regex engine.
+    return " ".join((markdown or "").split())
 
 
 def segment_checksum(markdown: str) -> Optional[bytes]:
@@ -25,7 +147,7 @@ def segment_checksum(markdown: str) -> Optional[bytes]:
     normalized = normalize_markdown(markdown)
     if not normalized:
         return None
-    return hashlib.sha256(normalized.encode("utf-8")).digest()
+    return _HASH(normalized.encode("utf-8")).digest()
 
 
 def assign_sequences(segments: Iterable[SegmentInput], *, per_parent: bool = False) -> None:
@@ -45,9 +167,55 @@ def assign_sequences(segments: Iterable[SegmentInput], *, per_parent: bool = Fal
             seg.sequence = idx
 
 
+# Containers at this depth (a ChatGPT mapping node, a Claude message) are
+# handed to the C encoder in one piece.
+_CANONICAL_STREAM_DEPTH = 2
+_dumps_sorted = json.JSONEncoder(sort_keys=True).encode
+
+
+def _canonical_update(update: Callable[[bytes], None], obj: object, depth: int = 0) -> None:
+    """
+    Feed the sorted-key JSON encoding of obj to update() piece by piece.
+
+    The bytes emitted are identical to json.dumps(obj, sort_keys=True), but the
+    outer levels of the payload are walked here so no single string holding the
+    whole document is ever built.
+    """
+    if depth >= _CANONICAL_STREAM_DEPTH or not isinstance(obj, (dict, list)) or not obj:
+        update(_dumps_sorted(obj).encode("ascii"))
+        return
+    if isinstance(obj, list):
+        update(b"[")
+        for index, item in enumerate(obj):
+            if index:
+                update(b", ")
+            _canonical_update(update, item, depth + 1)
+        update(b"]")
+        return
+    if not all(isinstance(key, str) for key in obj):
+        # Non-string keys are coerced by json.dumps; let it handle ordering too.
+        update(_dumps_sorted(obj).encode("ascii"))
+        return
+    update(b"{")
+    for index, key in enumerate(sorted(obj)):
+        if index:
+            update(b", ")
+        update(_dumps_sorted(key).encode("ascii"))
+        update(b": ")
+        _canonical_update(update, obj[key], depth + 1)
+    update(b"}")
+
+
+def canonical_sha256(obj: object) -> bytes:
+    """SHA-256 of json.dumps(obj, sort_keys=True), computed without materialising it."""
+    hasher = _HASH()
+    _canonical_update(hasher.update, obj)
+    return hasher.digest()
+
+
 def payload_checksum(raw_payload: Union[Mapping[str, object], list]) -> bytes:
     """Stable checksum for a payload using sorted JSON."""
-    return hashlib.sha256(json.dumps(raw_payload, sort_keys=True).encode("utf-8")).digest()
+    return canonical_sha256(raw_payload)
 
 
 def build_ingest_metadata(
@@ -1,15 +1,25 @@
 from __future__ import annotations
 
+import hashlib
 import string
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Mapping, Sequence, Union
+from typing import Callable, Iterable, Iterator, Mapping, Sequence, TypeVar, Union
 
 import psycopg
-from psycopg.types.json import Json
+from psycopg.types.json import Json, set_json_dumps
 
-from ingest.models import SegmentInput
+from ingest.common import dumps_json_bytes
+from ingest.models import SegmentAssetInput, SegmentInput
+
+R = TypeVar("R")
 
 
 @dataclass
@@ -19,6 +29,173 @@ class PersistResult:
 
 
 QUALITY_NOISE_THRESHOLD = 0.2
+# Attachment files hashed / read ahead on a thread pool (and the window size).
+_ASSET_READ_AHEAD = 8
+_QUALITY_CACHE_MAX_CHARS = 2048
+# Scores keyed by segment content_checksum, least recently used evicted first.
+_QUALITY_BY_CHECKSUM: OrderedDict[bytes, tuple[float, bool]] = OrderedDict()
+_QUALITY_BY_CHECKSUM_MAX = 16384
+# persist_document also runs in the app's threadpool (upload background tasks).
+_QUALITY_BY_CHECKSUM_LOCK = threading.Lock()
+# bytes.translate deletion tables: every byte value that is not ASCII
+# alphanumeric / not ASCII punctuation.
+_NON_ALNUM_ASCII = bytes(b for b in range(256) if not (b < 128 and chr(b).isalnum()))
+_NON_PUNCTUATION_ASCII = bytes(b for b in range(256) if chr(b) not in string.punctuation)
+
+# Hot statements live at module level and are sent with prepare=True so the
+# server parses and plans them once per connection rather than once per
+# document (psycopg would otherwise wait for five executions).
+#
+# The documents upsert and the version insert travel as one statement: the
+# version needs the document id, and chaining them in a CTE saves the
+# round-trip that waiting on the upsert's RETURNING would cost.
+_UPSERT_DOCUMENT_VERSION_SQL = """
+WITH document AS (
+    INSERT INTO documents (
+        source_system,
+        external_id,
+        title,
+        summary,
+        created_at,
+        updated_at,
+        raw_metadata
+    )
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (source_system, external_id)
+    DO UPDATE SET
+        title = EXCLUDED.title,
+        summary = EXCLUDED.summary,
+        created_at = EXCLUDED.created_at,
+        updated_at = EXCLUDED.updated_at,
+        raw_metadata = EXCLUDED.raw_metadata
+    RETURNING id, xmax = 0 AS inserted
+),
+version AS (
+    INSERT INTO document_versions (
+        document_id,
+        source_path,
+        checksum,
+        raw_payload,
+        ingest_batch_id,
+        ingested_by,
+        ingest_source,
+        ingest_version
+    )
+    SELECT id, %s, %s, %s, %s, %s, %s, %s
+    FROM document
+    ON CONFLICT (document_id, checksum)
+    DO NOTHING
+    RETURNING id
+)
+SELECT
+    document.id,
+    document.inserted,
+    (SELECT id FROM version) AS version_id
+FROM document
+"""
+
+_INSERT_SEGMENTS_SQL = """
+INSERT INTO document_segments (
+    id,
+    document_version_id,
+    parent_segment_id,
+    sequence,
+    source_role,
+    segment_type,
+    content_markdown,
+    content_checksum,
+    content_plaintext,
+    content_json,
+    quality_score,
+    is_noise,
+    embedding_status,
+    started_at,
+    ended_at,
+    raw_reference
+)
+SELECT
+    s.id,
+    %s,
+    s.parent_segment_id,
+    s.sequence,
+    s.source_role::segment_source_role,
+    s.segment_type::segment_type,
+    s.content_markdown,
+    s.content_checksum,
+    to_tsvector('english', s.plaintext),
+    s.content_json,
+    s.quality_score,
+    s.is_noise,
+    s.embedding_status,
+    s.started_at,
+    s.ended_at,
+    s.raw_reference
+FROM unnest(
+    %s::uuid[],
+    %s::uuid[],
+    %s::integer[],
+    %s::text[],
+    %s::text[],
+    %s::text[],
+    %s::bytea[],
+    %s::text[],
+    %s::jsonb[],
+    %s::real[],
+    %s::boolean[],
+    %s::text[],
+    %s::timestamptz[],
+    %s::timestamptz[],
+    %s::text[]
+) AS s (
+    id,
+    parent_segment_id,
+    sequence,
+    source_role,
+    segment_type,
+    content_markdown,
+    content_checksum,
+    plaintext,
+    content_json,
+    quality_score,
+    is_noise,
+    embedding_status,
+    started_at,
+    ended_at,
+    raw_reference
+)
+"""
+
+# COPY cannot be prepared; these are shared by _copy_rows callers below.
+# Binary COPY skips text escaping and parsing (bytea contents would
+# otherwise travel hex-encoded at twice their size), but needs each
+# column's type up front. Enum columns are declared as text: an enum's
+# binary form is its label, which is what the text dumper writes.
+_COPY_BLOCKS_SQL = """
+COPY segment_blocks (segment_id, sequence, block_type, language, body, raw_data)
+FROM STDIN (FORMAT BINARY)
+"""
+_COPY_BLOCKS_TYPES = ("uuid", "int4", "text", "text", "text", "jsonb")
+
+_COPY_ATTACHMENTS_SQL = """
+COPY attachments (
+    id, file_name, mime_type, size_bytes, local_path, source_reference, content, content_sha256
+)
+FROM STDIN (FORMAT BINARY)
+"""
+_COPY_ATTACHMENTS_TYPES = ("uuid", "text", "text", "int4", "text", "text", "bytea", "bytea")
+
+_COPY_SEGMENT_ASSETS_SQL = (
+    "COPY segment_assets (segment_id, asset_type, attachment_id) FROM STDIN (FORMAT BINARY)"
+)
+_COPY_SEGMENT_ASSETS_TYPES = ("uuid", "text", "uuid")
+
+# Oldest row wins when earlier ingests already stored duplicates.
+_SELECT_ATTACHMENTS_BY_DIGEST_SQL = """
+SELECT DISTINCT ON (content_sha256) content_sha256, id
+FROM attachments
+WHERE content_sha256 = ANY(%s)
+ORDER BY content_sha256, created_at
+"""
 
 
 def _read_asset_bytes(local_path: str | None) -> bytes | None:
@@ -30,6 +207,117 @@ def _read_asset_bytes(local_path: str | None) -> bytes | None:
         return None
 
 
+def _copy_rows(
+    cur: psycopg.Cursor,
+    statement: str,
+    types: Sequence[str],
+    rows: Iterable[tuple],
+) -> None:
+    """Stream rows into a table with a single binary COPY ... FROM STDIN."""
+    with cur.copy(statement) as copy:
+        copy.set_types(types)
+        for row in rows:
+            copy.write_row(row)
+
+
+def _asset_digest(local_path: str | None) -> bytes | None:
+    """SHA-256 of an asset file, hashed in chunks without holding its bytes."""
+    if not local_path:
+        return None
+    try:
+        with open(local_path, "rb") as fh:
+            return hashlib.file_digest(fh, "sha256").digest()
+    except OSError:
+        return None
+
+
+def _read_ahead(
+    func: Callable[[str | None], R],
+    local_paths: Sequence[str | None],
+) -> Iterator[R]:
+    """
+    Yield func(path) for each asset path in order, running ahead on a thread pool.
+
+    File reads release the GIL, so up to _ASSET_READ_AHEAD files are
+    processed while earlier results are consumed; the window also bounds
+    how many results (e.g. file contents) are held in memory at once, as
+    long as the caller consumes them lazily.
+    """
+    if sum(1 for path in local_paths if path) < 2:
+        for path in local_paths:
+            yield func(path)
+        return
+
+    paths = iter(local_paths)
+    with ThreadPoolExecutor(max_workers=_ASSET_READ_AHEAD) as pool:
+        window = deque(pool.submit(func, path) for path in islice(paths, _ASSET_READ_AHEAD))
+        while window:
+            future = window.popleft()
+            for path in islice(paths, 1):
+                window.append(pool.submit(func, path))
+            yield future.result()
+
+
+def _plan_attachments(
+    cur: psycopg.Cursor,
+    assets: Sequence[SegmentAssetInput],
+) -> tuple[list[tuple[uuid.UUID, SegmentAssetInput, bytes | None]], list[uuid.UUID]]:
+    """
+    Pick the attachment row each asset links to.
+
+    Assets backed by a readable file are hashed; when the digest is already
+    stored (or appeared earlier in this document) the existing row is
+    reused. Returns the attachments still to insert, with their digests,
+    and the attachment id for every asset in order. Only digests are kept
+    here: file contents are read again, for new attachments only, while
+    the COPY consumes _attachment_rows.
+    """
+    digests = list(_read_ahead(_asset_digest, [asset.local_path for asset in assets]))
+    known: dict[bytes, uuid.UUID] = {}
+    wanted = list({digest for digest in digests if digest is not None})
+    if wanted:
+        cur.execute(_SELECT_ATTACHMENTS_BY_DIGEST_SQL, (wanted,), prepare=True)
+        for row in cur.fetchall():
+            if isinstance(row, dict):
+                known[bytes(row["content_sha256"])] = row["id"]
+            else:
+                known[bytes(row[0])] = row[1]
+
+    new_attachments: list[tuple[uuid.UUID, SegmentAssetInput, bytes | None]] = []
+    attachment_ids: list[uuid.UUID] = []
+    for asset, digest in zip(assets, digests):
+        attachment_id = known.get(digest) if digest is not None else None
+        if attachment_id is None:
+            attachment_id = uuid.uuid4()
+            new_attachments.append((attachment_id, asset, digest))
+            if digest is not None:
+                known[digest] = attachment_id
+        attachment_ids.append(attachment_id)
+    return new_attachments, attachment_ids
+
+
+def _attachment_rows(
+    new_attachments: Sequence[tuple[uuid.UUID, SegmentAssetInput, bytes | None]],
+) -> Iterator[tuple]:
+    # Lazily consumed by the COPY, so at most _ASSET_READ_AHEAD files are
+    # in memory at once.
+    contents = _read_ahead(_read_asset_bytes, [asset.local_path for _, asset, _ in new_attachments])
+    for (attachment_id, asset, digest), content_bytes in zip(new_attachments, contents):
+        size_bytes = asset.size_bytes
+        if content_bytes is not None and size_bytes is None:
+            size_bytes = len(content_bytes)
+        yield (
+            attachment_id,
+            asset.file_name,
+            asset.mime_type,
+            size_bytes,
+            asset.local_path,
+            asset.source_reference,
+            content_bytes,
+            digest if content_bytes is not None else None,
+        )
+
+
 def estimate_segment_quality(markdown: str, plaintext: str) -> tuple[float, bool]:
     """
     Produce a lightweight quality score and noise flag for a segment.
@@ -43,15 +331,35 @@ def estimate_segment_quality(markdown: str, plaintext: str) -> tuple[float, bool
         text = (markdown or "").strip()
     if not text:
         return 0.0, True
+    if len(text) <= _QUALITY_CACHE_MAX_CHARS:
+        return _score_text_cached(text)
+    return _score_text(text)
+
 
-    normalized = " ".join(text.split())
+def _score_text(text: str) -> tuple[float, bool]:
+    # Splitting the normalized string again would yield the same tokens.
+    tokens = text.split()
+    # If the lengths already match, every whitespace run is a single
+    # character between tokens; it counts the same as the space it would
+    # become, so the text can be scored as is without rebuilding it.
+    if sum(map(len, tokens)) + len(tokens) - 1 == len(text):
+        normalized = text
+    else:
+        normalized = " ".join(tokens)
     length = len(normalized)
-    tokens = normalized.split()
     token_count = len(tokens)
     unique_tokens = len(set(tokens))
 
-    alnum_chars = sum(ch.isalnum() for ch in normalized)
-    punctuation_chars = sum(ch in string.punctuation for ch in normalized)
+    # Count by deleting every other byte value in one C-level pass.
+    # string.punctuation is ASCII-only and UTF-8 never reuses ASCII byte
+    # values inside multi-byte sequences, so the punctuation count is exact
+    # for any text; alnum needs str.isalnum once non-ASCII letters appear.
+    data = normalized.encode("utf-8")
+    punctuation_chars = len(data.translate(None, _NON_PUNCTUATION_ASCII))
+    if len(data) == length:
+        alnum_chars = len(data.translate(None, _NON_ALNUM_ASCII))
+    else:
+        alnum_chars = sum(ch.isalnum() for ch in normalized)
 
     alpha_ratio = alnum_chars / length if length else 0.0
     punctuation_ratio = punctuation_chars / length if length else 0.0
@@ -76,6 +384,97 @@ def estimate_segment_quality(markdown: str, plaintext: str) -> tuple[float, bool
     return score, is_noise
 
 
+# Short segments (greetings, boilerplate, template replies) repeat across
+# conversations, so their scores are memoised by text. Python caches a
+# str's hash on the object, so a hit costs one C-level hash. Long texts
+# are rarely repeated and would pin too much memory.
+_score_text_cached = lru_cache(maxsize=8192)(_score_text)
+
+
+def _segment_quality(segment: SegmentInput) -> tuple[float, bool]:
+    """
+    estimate_segment_quality for a segment, reusing scores by content_checksum.
+
+    content_checksum is the SHA-256 of the whitespace-normalized markdown, so
+    it identifies the scored text only when the markdown is what gets
+    scored: plaintext is empty or the same as the markdown. Other segments
+    are scored directly.
+    """
+    markdown = (segment.content_markdown or "").strip()
+    plaintext = (segment.plaintext or "").strip()
+    checksum = segment.content_checksum
+    if checksum is None or (plaintext and plaintext != markdown):
+        return estimate_segment_quality(segment.content_markdown, segment.plaintext)
+
+    with _QUALITY_BY_CHECKSUM_LOCK:
+        cached = _QUALITY_BY_CHECKSUM.get(checksum)
+        if cached is not None:
+            _QUALITY_BY_CHECKSUM.move_to_end(checksum)
+            return cached
+    result = estimate_segment_quality(segment.content_markdown, segment.plaintext)
+    with _QUALITY_BY_CHECKSUM_LOCK:
+        _QUALITY_BY_CHECKSUM[checksum] = result
+        if len(_QUALITY_BY_CHECKSUM) > _QUALITY_BY_CHECKSUM_MAX:
+            _QUALITY_BY_CHECKSUM.popitem(last=False)
+    return result
+
+
+def register_json_adapters(conn: psycopg.Connection) -> None:
+    """
+    Make conn serialize json/jsonb with orjson when installed.
+
+    Covers every Json() wrapper without its own dumps= (raw_metadata,
+    content_json, block raw_data); values orjson rejects go through the
+    stdlib. Loading stays on the stdlib: orjson would silently round jsonb
+    integers wider than 64 bits to floats in what the API returns.
+    """
+    set_json_dumps(dumps_json_bytes, conn)
+
+
+def connect(dsn: str) -> psycopg.Connection:
+    """
+    Open an ingest connection that prepares every statement on first use.
+
+    The CLIs run the same handful of statements for every batch, so there is
+    no point waiting for psycopg's default threshold of five executions.
+    Not for scripts that send several statements in one execute (migrations):
+    those cannot be prepared.
+    """
+    conn = psycopg.connect(dsn, prepare_threshold=0)
+    register_json_adapters(conn)
+    return conn
+
+
+def fetch_version_checksums(
+    conn: psycopg.Connection,
+    source_system: str,
+    external_ids: Iterable[str],
+) -> set[tuple[str, bytes]]:
+    """Return the (external_id, checksum) pairs already stored for the given documents."""
+    external_ids = list(external_ids)
+    if not external_ids:
+        return set()
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT d.external_id, v.checksum
+            FROM documents d
+            JOIN document_versions v ON v.document_id = d.id
+            WHERE d.source_system = %s
+              AND d.external_id = ANY(%s)
+            """,
+            (source_system, external_ids),
+        )
+        rows = cur.fetchall()
+    pairs: set[tuple[str, bytes]] = set()
+    for row in rows:
+        if isinstance(row, dict):
+            pairs.add((row["external_id"], bytes(row["checksum"])))
+        else:
+            pairs.add((row[0], bytes(row[1])))
+    return pairs
+
+
 def persist_document(
     conn: psycopg.Connection,
     *,
@@ -92,240 +491,150 @@ def persist_document(
     segments: Sequence[SegmentInput],
     ingest_metadata: Mapping[str, object] | None = None,
 ) -> PersistResult:
-    """Insert or update a document and its segments."""
-    ingest_metadata = ingest_metadata or {}
-    with conn.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO documents (
-                source_system,
-                external_id,
-                title,
-                summary,
-                created_at,
-                updated_at,
-                raw_metadata
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (source_system, external_id)
-            DO UPDATE SET
-                title = EXCLUDED.title,
-                summary = EXCLUDED.summary,
-                created_at = EXCLUDED.created_at,
-                updated_at = EXCLUDED.updated_at,
-                raw_metadata = EXCLUDED.raw_metadata
-            RETURNING id, xmax = 0 AS inserted
-            """,
-            (
-                source_system,
-                external_id,
-                title,
-                summary,
-                created_at,
-                updated_at,
-                Json(raw_metadata),
-            ),
-        )
-        document_row = cur.fetchone()
-        if document_row is None:
-            raise RuntimeError("Failed to insert or update document record.")
-        if isinstance(document_row, dict):
-            document_id = document_row["id"]
-            document_created = bool(document_row["inserted"])
-        else:
-            document_id = document_row[0]
-            document_created = bool(document_row[1])
-
-        cur.execute(
-            """
-            INSERT INTO document_versions (
-                document_id,
-                source_path,
-                checksum,
-                raw_payload,
-                ingest_batch_id,
-                ingested_by,
-                ingest_source,
-                ingest_version
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (document_id, checksum)
-            DO NOTHING
-            RETURNING id
-            """,
-            (
-                document_id,
-                source_path,
-                checksum,
-                Json(raw_payload),
-                ingest_metadata.get("ingest_batch_id"),
-                ingest_metadata.get("ingested_by"),
-                ingest_metadata.get("ingest_source"),
-                ingest_metadata.get("ingest_version"),
-            ),
-        )
-        version_row = cur.fetchone()
-        if not version_row:
-            return PersistResult(
-                document_created=document_created,
-                version_created=False,
-            )
-        document_version_id = (
-            version_row["id"] if isinstance(version_row, dict) else version_row[0]
-        )
+    """
+    Insert or update a document and its segments.
 
-        node_to_segment_id: dict[str, str] = {}
-        for segment in segments:
-            parent_segment_id = (
-                node_to_segment_id.get(segment.parent_node_id)
-                if segment.parent_node_id
-                else None
-            )
-            auto_score, auto_noise = estimate_segment_quality(
-                segment.content_markdown,
-                segment.plaintext,
-            )
-            quality_score = (
-                segment.quality_score
-                if segment.quality_score is not None
-                else auto_score
-            )
-            if segment.is_noise:
-                is_noise = True
-                embedding_status_override = "skipped_noise"
-            elif segment.quality_score is not None:
-                is_noise = segment.quality_score < QUALITY_NOISE_THRESHOLD
-                embedding_status_override = None
-            else:
-                is_noise = auto_noise
-                embedding_status_override = None
+    Runs in its own transaction block: a savepoint when the caller already
+    has a transaction open, so callers can commit many documents at once
+    and a failing document only rolls back its own rows.
+    """
+    ingest_metadata = ingest_metadata or {}
+    with conn.transaction():
+        with conn.cursor() as cur:
             cur.execute(
-                """
-                INSERT INTO document_segments (
-                    document_version_id,
-                    parent_segment_id,
-                    sequence,
-                    source_role,
-                    segment_type,
-                    content_markdown,
-                    content_checksum,
-                    content_plaintext,
-                    content_json,
-                    quality_score,
-                    is_noise,
-                    embedding_status,
-                    started_at,
-                    ended_at,
-                    raw_reference
-                )
-                VALUES (
-                    %s, %s, %s, %s, %s, %s, %s,
-                    to_tsvector('english', %s),
-                    %s, %s, %s, %s, %s, %s, %s
-                )
-                RETURNING id
-                """,
+                _UPSERT_DOCUMENT_VERSION_SQL,
                 (
-                    document_version_id,
-                    parent_segment_id,
-                    segment.sequence,
-                    segment.source_role,
-                    segment.segment_type,
-                    segment.content_markdown,
-                    segment.content_checksum,
-                    segment.plaintext,
-                    Json(segment.content_json)
-                    if segment.content_json is not None
-                    else None,
-                    quality_score,
-                    is_noise,
-                    embedding_status_override if is_noise else None,
-                    segment.started_at,
-                    segment.ended_at,
-                    segment.raw_reference,
+                    source_system,
+                    external_id,
+                    title,
+                    summary,
+                    created_at,
+                    updated_at,
+                    Json(raw_metadata),
+                    source_path,
+                    checksum,
+                    Json(raw_payload, dumps=dumps_json_bytes),
+                    ingest_metadata.get("ingest_batch_id"),
+                    ingest_metadata.get("ingested_by"),
+                    ingest_metadata.get("ingest_source"),
+                    ingest_metadata.get("ingest_version"),
                 ),
+                prepare=True,
             )
-            segment_row = cur.fetchone()
-            if segment_row is None:
-                raise RuntimeError("Failed to insert segment record.")
-            segment_id = (
-                segment_row["id"] if isinstance(segment_row, dict) else segment_row[0]
-            )
-            node_to_segment_id[segment.node_id] = segment_id
+            document_row = cur.fetchone()
+            if document_row is None:
+                raise RuntimeError("Failed to insert or update document record.")
+            if isinstance(document_row, dict):
+                document_created = bool(document_row["inserted"])
+                document_version_id = document_row["version_id"]
+            else:
+                document_created = bool(document_row[1])
+                document_version_id = document_row[2]
+            if document_version_id is None:
+                return PersistResult(
+                    document_created=document_created,
+                    version_created=False,
+                )
 
-            for index, block in enumerate(segment.blocks, start=1):
-                cur.execute(
-                    """
-                    INSERT INTO segment_blocks (
-                        segment_id,
-                        sequence,
-                        block_type,
-                        language,
-                        body,
-                        raw_data
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    """,
+            # Ids are generated here so parent links, blocks and assets can be
+            # resolved without waiting on RETURNING for each segment.
+            node_to_segment_id: dict[str, uuid.UUID] = {}
+            segment_rows: list[tuple] = []
+            block_rows: list[tuple] = []
+            asset_links: list[tuple[uuid.UUID, SegmentAssetInput]] = []
+            for segment in segments:
+                segment_id = uuid.uuid4()
+                parent_segment_id = (
+                    node_to_segment_id.get(segment.parent_node_id)
+                    if segment.parent_node_id
+                    else None
+                )
+                node_to_segment_id[segment.node_id] = segment_id
+                auto_score, auto_noise = _segment_quality(segment)
+                quality_score = (
+                    segment.quality_score
+                    if segment.quality_score is not None
+                    else auto_score
+                )
+                if segment.is_noise:
+                    is_noise = True
+                    embedding_status_override = "skipped_noise"
+                elif segment.quality_score is not None:
+                    is_noise = segment.quality_score < QUALITY_NOISE_THRESHOLD
+                    embedding_status_override = None
+                else:
+                    is_noise = auto_noise
+                    embedding_status_override = None
+                segment_rows.append(
                     (
                         segment_id,
-                        index,
-                        block.block_type,
-                        block.language,
-                        block.body,
-                        Json(block.raw_data) if block.raw_data is not None else None,
-                    ),
+                        parent_segment_id,
+                        segment.sequence,
+                        segment.source_role,
+                        segment.segment_type,
+                        segment.content_markdown,
+                        segment.content_checksum,
+                        segment.plaintext,
+                        Json(segment.content_json)
+                        if segment.content_json is not None
+                        else None,
+                        quality_score,
+                        is_noise,
+                        embedding_status_override if is_noise else None,
+                        segment.started_at,
+                        segment.ended_at,
+                        segment.raw_reference,
+                    )
                 )
 
-            for asset in segment.assets:
-                content_bytes = _read_asset_bytes(asset.local_path)
-                size_bytes = asset.size_bytes
-                if content_bytes is not None and size_bytes is None:
-                    size_bytes = len(content_bytes)
+                for index, block in enumerate(segment.blocks, start=1):
+                    block_rows.append(
+                        (
+                            segment_id,
+                            index,
+                            block.block_type,
+                            block.language,
+                            block.body,
+                            Json(block.raw_data) if block.raw_data is not None else None,
+                        )
+                    )
+
+                for asset in segment.assets:
+                    asset_links.append((segment_id, asset))
 
+            # COPY cannot call to_tsvector, so segments go in as one multi-row
+            # INSERT over column arrays; blocks and assets below use COPY.
+            if segment_rows:
                 cur.execute(
-                    """
-                    INSERT INTO attachments (
-                        file_name,
-                        mime_type,
-                        size_bytes,
-                        local_path,
-                        source_reference,
-                        content
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                    """,
-                    (
-                        asset.file_name,
-                        asset.mime_type,
-                        size_bytes,
-                        asset.local_path,
-                        asset.source_reference,
-                        content_bytes,
-                    ),
-                )
-                attachment_row = cur.fetchone()
-                if attachment_row is None:
-                    raise RuntimeError("Failed to create attachment record.")
-                attachment_id = (
-                    attachment_row["id"]
-                    if isinstance(attachment_row, dict)
-                    else attachment_row[0]
+                    _INSERT_SEGMENTS_SQL,
+                    (document_version_id, *(list(column) for column in zip(*segment_rows))),
+                    prepare=True,
                 )
 
-                cur.execute(
-                    """
-                    INSERT INTO segment_assets (
-                        segment_id,
-                        asset_type,
-                        attachment_id
+            if block_rows:
+                _copy_rows(cur, _COPY_BLOCKS_SQL, _COPY_BLOCKS_TYPES, block_rows)
+
+            # Attachments and their links need no RETURNING (ids are generated
+            # here), so stream them in with COPY instead of one INSERT per row.
+            # Identical files share one attachment row, found by content digest.
+            if asset_links:
+                new_attachments, attachment_ids = _plan_attachments(
+                    cur, [asset for _, asset in asset_links]
+                )
+                if new_attachments:
+                    _copy_rows(
+                        cur,
+                        _COPY_ATTACHMENTS_SQL,
+                        _COPY_ATTACHMENTS_TYPES,
+                        _attachment_rows(new_attachments),
                     )
-                    VALUES (%s, %s, %s)
-                    """,
+                _copy_rows(
+                    cur,
+                    _COPY_SEGMENT_ASSETS_SQL,
+                    _COPY_SEGMENT_ASSETS_TYPES,
                     (
-                        segment_id,
-                        asset.asset_type,
-                        attachment_id,
+                        (segment_id, asset.asset_type, attachment_id)
+                        for (segment_id, asset), attachment_id in zip(asset_links, attachment_ids)
                     ),
                 )
     return PersistResult(
@@ -1,15 +1,29 @@
 from __future__ import annotations
 
+import time
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from functools import partial
 from datetime import datetime
-from typing import Mapping, Sequence, Union, Any
+from itertools import islice
+from typing import Any, Callable, Dict, Generic, Iterable, Iterator, List, Mapping, Optional, Sequence, TypeVar, Union
 
 import psycopg
 
 from ingest.common import assign_sequences, build_ingest_metadata, payload_checksum, segment_checksum
-from ingest.db import PersistResult, persist_document
+from ingest.db import PersistResult, fetch_version_checksums, persist_document
 from ingest.models import SegmentInput
 
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Items sent to a prepare worker per round-trip.
+PREPARE_CHUNKSIZE = 32
+# Documents per ingest_batch transaction, unless the CLI's *_BATCH env var says otherwise.
+DEFAULT_BATCH_SIZE = 50
+# Minimum seconds between redraws of the progress line.
+PROGRESS_INTERVAL = 0.1
+
 
 @dataclass
 class ParsedDocument:
@@ -34,6 +48,7 @@ def ingest_document(
     ingest_source: str | None = None,
     ingest_version: str | None = None,
     per_parent_sequences: bool = False,
+    checksum: bytes | None = None,
 ) -> PersistResult:
     """
     Shared ingestion pipeline for all sources.
@@ -41,14 +56,14 @@ def ingest_document(
     Steps:
     - Assign sequences
     - Compute segment checksums
-    - Compute payload checksum
+    - Compute payload checksum (unless the caller already has it)
     - Persist document/version/segments with ingest metadata
     """
     assign_sequences(segments, per_parent=per_parent_sequences)
     for seg in segments:
         seg.content_checksum = segment_checksum(seg.content_markdown)
 
-    version_checksum = payload_checksum(parsed_doc.raw_payload)
+    version_checksum = checksum if checksum is not None else payload_checksum(parsed_doc.raw_payload)
     ingest_meta = build_ingest_metadata(
         ingest_batch_id=ingest_batch_id,
         ingested_by=ingested_by,
@@ -71,3 +86,153 @@ def ingest_document(
         segments=segments,
         ingest_metadata=ingest_meta,
     )
+
+
+def _prepare_or_none(prepare: Callable[[T], R], item: T) -> Optional[R]:
+    try:
+        return prepare(item)
+    except Exception:
+        return None
+
+
+def iter_prepared_batches(
+    items: Iterable[T],
+    batch_size: int,
+    prepare: Callable[[T], R],
+    *,
+    workers: int = 1,
+) -> Iterator[tuple[List[T], Optional[List[Optional[R]]]]]:
+    """
+    Yield items in lists of batch_size, with prepare() results when parallel.
+
+    With workers <= 1 the second element is None and callers prepare items
+    themselves (lazily, so they can skip ones they don't need). Otherwise
+    prepare runs in a process pool, PREPARE_CHUNKSIZE items per round-trip,
+    and the next batch is submitted before the current one is yielded, so
+    parsing overlaps with the caller's database writes while at most two
+    batches are held in memory. prepare must be picklable (a module-level
+    function or functools.partial).
+
+    An item whose prepare() raises gets None instead of a result, and the
+    rest of its batch is kept; the caller then prepares that item itself
+    and sees the same error the serial path would.
+    """
+    iterator = iter(items)
+    if workers <= 1:
+        while batch := list(islice(iterator, batch_size)):
+            yield batch, None
+        return
+
+    guarded = partial(_prepare_or_none, prepare)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        batch = list(islice(iterator, batch_size))
+        pending = executor.map(guarded, batch, chunksize=PREPARE_CHUNKSIZE) if batch else None
+        while batch:
+            next_batch = list(islice(iterator, batch_size))
+            next_pending = (
+                executor.map(guarded, next_batch, chunksize=PREPARE_CHUNKSIZE)
+                if next_batch
+                else None
+            )
+            yield batch, list(pending)
+            batch, pending = next_batch, next_pending
+
+
+def ingest_batch(
+    conn: psycopg.Connection,
+    source_system: str,
+    batch: Sequence[T],
+    external_id: Callable[[T], str],
+    ingest_one: Callable[[T, bytes, Optional[List[SegmentInput]]], PersistResult],
+    *,
+    payload: Callable[[T], Any] | None = None,
+    prepared: Optional[Sequence[Optional[tuple[bytes, List[SegmentInput]]]]] = None,
+    on_error: Callable[[T, Exception], None] | None = None,
+) -> List[tuple[bytes, Optional[PersistResult]]]:
+    """
+    Ingest a batch of documents in a single transaction.
+
+    Returns a (checksum, result) pair per item. Items whose payload checksum
+    is already stored for their external id are reported as unchanged
+    without calling ingest_one, so their segments are never built.
+    prepared carries (checksum, segments) pairs computed by worker processes
+    (see iter_prepared_batches); for items without one (no prepared list, or
+    a None entry) the checksum is computed here from payload(item), or the
+    item itself, and ingest_one gets segments=None.
+
+    persist_document runs each document in its own savepoint, so when one
+    fails only its rows are rolled back. By default the items before it are
+    committed and the error is re-raised, without replaying the batch; with
+    on_error, the item and exception are passed to it instead, the item's
+    result is None, and the rest of the batch is ingested.
+    """
+    checksums: List[bytes] = []
+    segment_lists: List[Optional[List[SegmentInput]]] = []
+    for item, entry in zip(batch, prepared or [None] * len(batch)):
+        if entry is None:
+            checksums.append(payload_checksum(payload(item) if payload else item))
+            segment_lists.append(None)
+        else:
+            checksums.append(entry[0])
+            segment_lists.append(entry[1])
+    external_ids = [external_id(item) for item in batch]
+    known = fetch_version_checksums(conn, source_system, external_ids)
+
+    results: List[tuple[bytes, Optional[PersistResult]]] = []
+    try:
+        for item, item_id, checksum, segments in zip(batch, external_ids, checksums, segment_lists):
+            if (item_id, checksum) in known:
+                result = PersistResult(document_created=False, version_created=False)
+            elif on_error is None:
+                result = ingest_one(item, checksum, segments)
+            else:
+                try:
+                    result = ingest_one(item, checksum, segments)
+                except Exception as exc:
+                    on_error(item, exc)
+                    result = None
+            results.append((checksum, result))
+    except Exception:
+        conn.commit()
+        raise
+    conn.commit()
+    return results
+
+
+class IngestProgress(Generic[T]):
+    """
+    Running new/updated/unchanged tally for a CLI ingest, with a progress line
+    redrawn at most every PROGRESS_INTERVAL seconds. label(item) names the
+    current item on that line and is only called when it is redrawn.
+    """
+
+    def __init__(self, label: Callable[[T], str]) -> None:
+        self.stats: Dict[str, int] = {"new": 0, "updated": 0, "unchanged": 0}
+        self.ingested = 0
+        self._label = label
+        self._last_draw = 0.0
+
+    def record(self, item: T, result: PersistResult) -> None:
+        if not result.version_created:
+            self.stats["unchanged"] += 1
+        elif result.document_created:
+            self.stats["new"] += 1
+        else:
+            self.stats["updated"] += 1
+
+        self.ingested += 1
+        now = time.monotonic()
+        if now - self._last_draw >= PROGRESS_INTERVAL:
+            self._last_draw = now
+            message = (
+                f"new: {self.stats['new']} | updated: {self.stats['updated']} | "
+                f"unchanged: {self.stats['unchanged']} | {self._label(item)}"
+            )
+            print(f"\r{message}\x1b[K", end="", flush=True)
+
+    def finish(self, source: Any) -> None:
+        print("\r" + " " * 120 + "\r", end="")
+        print(
+            f"Ingested {self.ingested} conversation(s) from {source} | "
+            f"new: {self.stats['new']} updated: {self.stats['updated']} unchanged: {self.stats['unchanged']}"
+        )
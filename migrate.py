@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
+import hashlib
 import logging
 import os
+import re
 import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from graphlib import CycleError, TopologicalSorter
 from pathlib import Path
 from typing import List
 
@@ -19,6 +23,11 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Repeatable scripts applied at once, each on its own connection.
+REPEATABLE_WORKERS = 4
+# Header line in a db/*.sql file naming scripts that must run before it.
+DEPENDS_ON_RE = re.compile(r"^--\s*depends-on:\s*(.+)$", re.MULTILINE)
+
 
 def get_connection():
     dsn = os.getenv("DATABASE_URL")
@@ -52,18 +61,50 @@ def record_migration(conn: psycopg.Connection, version: str):
         cur.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
 
 
-def run_sql_file(conn: psycopg.Connection, filepath: Path):
-    """Read and execute a SQL file."""
+def ensure_repeatable_table(conn: psycopg.Connection):
+    """Create the table tracking repeatable scripts if it doesn't exist."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_repeatable (
+                name TEXT PRIMARY KEY,
+                sha256 BYTEA NOT NULL,
+                applied_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+
+
+def get_repeatable_digests(conn: psycopg.Connection) -> dict:
+    """Return the SHA-256 each repeatable script had when it last ran."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT name, sha256 FROM schema_repeatable")
+        return {row[0]: bytes(row[1]) for row in cur.fetchall()}
+
+
+def record_repeatable(conn: psycopg.Connection, name: str, digest: bytes):
+    """Record the digest of a repeatable script that ran successfully."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO schema_repeatable (name, sha256) VALUES (%s, %s)
+            ON CONFLICT (name) DO UPDATE
+            SET sha256 = EXCLUDED.sha256, applied_at = CURRENT_TIMESTAMP
+            """,
+            (name, digest),
+        )
+
+
+def run_sql_file(conn: psycopg.Connection, filepath: Path, sql: str | None = None):
+    """Read and execute a SQL file (or its already-read contents)."""
     logger.info(f"Executing {filepath.name}...")
-    with open(filepath, "r", encoding="utf-8") as f:
-        sql = f.read()
+    if sql is None:
+        sql = filepath.read_text(encoding="utf-8")
 
     with conn.cursor() as cur:
         cur.execute(sql)
 
 
-def apply_migrations(conn: psycopg.Connection, migrations_dir: Path):
-    """Apply all pending migrations from the directory."""
+def apply_migrations(conn: psycopg.Connection, migrations_dir: Path) -> int:
+    """Apply all pending migrations from the directory; return how many ran."""
     ensure_migrations_table(conn)
     applied = get_applied_migrations(conn)
 
@@ -75,7 +116,7 @@ def apply_migrations(conn: psycopg.Connection, migrations_dir: Path):
 
     if not migration_files:
         logger.warning(f"No migration files found in {migrations_dir}")
-        return
+        return 0
 
     new_migrations_count = 0
     for script in migration_files:
@@ -99,31 +140,112 @@ def apply_migrations(conn: psycopg.Connection, migrations_dir: Path):
         logger.info("Database is up to date.")
     else:
         logger.info(f"Successfully applied {new_migrations_count} migrations.")
+    return new_migrations_count
+
+
+def parse_dependencies(sql: str) -> set:
+    """Return the script names listed in `-- depends-on: a.sql, b.sql` lines."""
+    return {
+        name.strip()
+        for line in DEPENDS_ON_RE.findall(sql)
+        for name in line.split(",")
+        if name.strip()
+    }
+
+
+def apply_repeatable_script(script: Path, sql: str, digest: bytes) -> bool:
+    """
+    Run one repeatable script on its own connection and record its digest.
+
+    Returns whether the script was applied; failures are logged, not raised.
+    """
+    try:
+        with get_connection() as conn:
+            # These might contain large index creations, so we log start/finish
+            with conn.transaction():
+                run_sql_file(conn, script, sql)
+                record_repeatable(conn, script.name, digest)
+    except Exception as e:
+        logger.warning(f"Error running {script.name}: {e}")
+        # We don't exit here because some might fail if dependencies aren't ready,
+        # though ideally they should work.
+        return False
+    return True
 
 
-def apply_repeatable_schema(conn: psycopg.Connection, db_dir: Path):
+def apply_repeatable_schema(conn: psycopg.Connection, db_dir: Path, force: bool = False):
     """
     Apply repeatable schema definitions (views, functions, indexes)
     found in the db/ directory.
+
+    Scripts whose SHA-256 matches the one recorded in schema_repeatable are
+    skipped unless force is set (main sets it after new migrations, since
+    views and functions may need re-creating against the changed tables).
+
+    Scripts run in parallel, up to REPEATABLE_WORKERS at a time; a script
+    starts only once every script named in its `-- depends-on:` header has
+    been applied. Scripts whose dependencies failed are skipped and left
+    unrecorded, so the next run retries them.
     """
     # These are typically idempotent (CREATE OR REPLACE) or generally safe to run
     # to update definitions.
     logger.info("Applying repeatable schema definitions from db/...")
+    ensure_repeatable_table(conn)
+    applied = {} if force else get_repeatable_digests(conn)
 
-    sql_files = sorted(
-        [f for f in db_dir.iterdir() if f.is_file() and f.suffix == ".sql"],
-        key=lambda f: f.name,
-    )
+    scripts = {f.name: f for f in db_dir.iterdir() if f.is_file() and f.suffix == ".sql"}
+    sources = {name: script.read_text(encoding="utf-8") for name, script in scripts.items()}
 
-    for script in sql_files:
-        try:
-            # These might contain large index creations, so we log start/finish
-            with conn.transaction():
-                run_sql_file(conn, script)
-        except Exception as e:
-            logger.warning(f"Error running {script.name}: {e}")
-            # We don't exit here because some might fail if dependencies aren't ready,
-            # though ideally they should work.
+    graph = {}
+    for name, sql in sources.items():
+        dependencies = parse_dependencies(sql)
+        for missing in sorted(dependencies - scripts.keys()):
+            logger.warning(f"{name} depends on {missing}, which is not in db/; ignoring.")
+        graph[name] = dependencies & scripts.keys()
+
+    sorter = TopologicalSorter(graph)
+    try:
+        sorter.prepare()
+    except CycleError as e:
+        logger.error(f"Circular depends-on headers in db/: {e.args[1]}")
+        sys.exit(1)
+
+    skipped = 0
+    failed = set()
+    with ThreadPoolExecutor(max_workers=REPEATABLE_WORKERS) as pool:
+        running = {}
+        while sorter.is_active():
+            for name in sorted(sorter.get_ready()):
+                broken = sorted(graph[name] & failed)
+                if broken:
+                    logger.warning(f"Skipping {name}: dependency {', '.join(broken)} failed.")
+                    failed.add(name)
+                    sorter.done(name)
+                    continue
+                sql = sources[name]
+                digest = hashlib.sha256(sql.encode("utf-8")).digest()
+                if applied.get(name) == digest:
+                    skipped += 1
+                    sorter.done(name)
+                    continue
+                running[pool.submit(apply_repeatable_script, scripts[name], sql, digest)] = name
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    ok = future.result()
+                except (Exception, SystemExit) as e:
+                    # get_connection exits when DATABASE_URL is unset.
+                    logger.warning(f"Error running {name}: {e!r}")
+                    ok = False
+                if not ok:
+                    failed.add(name)
+                sorter.done(name)
+
+    if skipped:
+        logger.info(f"Skipped {skipped} unchanged repeatable scripts.")
 
 
 def main():
@@ -137,7 +259,7 @@ def main():
 
             # 1. Apply Versioned Migrations
             if migrations_dir.exists():
-                apply_migrations(conn, migrations_dir)
+                new_migrations = apply_migrations(conn, migrations_dir)
             else:
                 logger.error(f"Migrations directory not found: {migrations_dir}")
                 sys.exit(1)
@@ -145,7 +267,7 @@ def main():
             # 2. Apply Repeatable Schema (Views, Indexes, etc.)
             # This is optional but ensures views match the new table structures.
             if db_dir.exists():
-                apply_repeatable_schema(conn, db_dir)
+                apply_repeatable_schema(conn, db_dir, force=new_migrations > 0)
 
     except psycopg.OperationalError as e:
         logger.error(f"Could not connect to database: {e}")
@@ -0,0 +1,19 @@
+BEGIN;
+
+-- SHA-256 of attachments.content so identical files (avatars, logos, images
+-- pasted into several conversations) can share one attachment row. The
+-- ingest looks existing rows up by digest before streaming new ones.
+ALTER TABLE attachments
+    ADD COLUMN IF NOT EXISTS content_sha256 BYTEA;
+
+UPDATE attachments
+SET content_sha256 = sha256(content)
+WHERE content IS NOT NULL
+  AND content_sha256 IS NULL;
+
+-- Non-unique: rows stored before this migration may already be duplicates.
+CREATE INDEX IF NOT EXISTS attachments_content_sha256_idx
+    ON attachments (content_sha256)
+    WHERE content_sha256 IS NOT NULL;
+
+COMMIT;
@@ -0,0 +1,9 @@
+BEGIN;
+
+-- Schema for the API views and functions in db/. Creating it here, before
+-- the repeatable scripts run in parallel, keeps their own
+-- CREATE SCHEMA IF NOT EXISTS api a no-op instead of two sessions racing to
+-- insert the same pg_namespace row.
+CREATE SCHEMA IF NOT EXISTS api;
+
+COMMIT;
@@ -1,17 +1,101 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
 import os
 import sys
+from importlib.util import find_spec
 from pathlib import Path
+from typing import List
 
-import requests
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+try:
+    import requests
+except ImportError:  # pragma: no cover - optional dependency
+    requests = None
+
+try:
+    from requests_toolbelt import MultipartEncoder
+except ImportError:  # pragma: no cover - optional dependency
+    MultipartEncoder = None
+
+# Uploads in flight at once when several files are given (httpx only).
+UPLOAD_CONCURRENCY = 4
+
+
+def _report(path: Path, response) -> bool:
+    """Print the outcome of an upload (requests or httpx response)."""
+    if response.status_code == 200:
+        data = response.json()
+        print(f"{path.name}: Success: {data.get('message', 'Upload accepted')}")
+        return True
+    print(f"{path.name}: Failed (HTTP {response.status_code}): {response.text}")
+    return False
+
+
+async def _upload_one_async(client, semaphore, path: Path, url: str, headers: dict, params: dict) -> bool:
+    async with semaphore:
+        print(f"Uploading {path.name} to {url}...")
+        try:
+            with open(path, "rb") as f:
+                # httpx streams file fields in chunks rather than building
+                # the whole multipart body in memory.
+                response = await client.post(
+                    url,
+                    headers=headers,
+                    params=params,
+                    files={"file": (path.name, f, "application/zip")},
+                )
+        except httpx.HTTPError as e:
+            print(f"{path.name}: Network error: {e}")
+            return False
+    return _report(path, response)
+
+
+async def _upload_all_async(paths: List[Path], url: str, headers: dict, params: dict) -> bool:
+    # HTTP/2 needs the optional h2 package (httpx[http2]); without it httpx
+    # still shares one HTTP/1.1 connection pool across the uploads.
+    async with httpx.AsyncClient(http2=find_spec("h2") is not None, timeout=None) as client:
+        semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+        results = await asyncio.gather(
+            *(_upload_one_async(client, semaphore, path, url, headers, params) for path in paths)
+        )
+    return all(results)
+
+
+def _upload_one(path: Path, url: str, headers: dict, params: dict) -> bool:
+    print(f"Uploading {path.name} to {url}...")
+    try:
+        with open(path, "rb") as f:
+            if MultipartEncoder is not None:
+                # Streams the ZIP in chunks; requests' own multipart support
+                # builds the whole body in memory first.
+                encoder = MultipartEncoder(
+                    fields={"file": (path.name, f, "application/zip")}
+                )
+                response = requests.post(
+                    url,
+                    headers={**headers, "Content-Type": encoder.content_type},
+                    params=params,
+                    data=encoder,
+                )
+            else:
+                files = {"file": (path.name, f, "application/zip")}
+                response = requests.post(url, headers=headers, params=params, files=files)
+    except requests.RequestException as e:
+        print(f"{path.name}: Network error: {e}")
+        return False
+    return _report(path, response)
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Upload an export ZIP to the 2brain remote API."
+        description="Upload export ZIPs to the 2brain remote API."
     )
-    parser.add_argument("file", type=Path, help="Path to the .zip export file.")
+    parser.add_argument("file", type=Path, nargs="+", help="Path(s) to .zip export files.")
     parser.add_argument(
         "--url",
         default=os.environ.get("API_URL", "http://localhost:8100"),
@@ -31,34 +115,29 @@ def main():
 
     args = parser.parse_args()
 
-    if not args.file.exists():
-        print(f"Error: File '{args.file}' does not exist.")
-        sys.exit(1)
+    for path in args.file:
+        if not path.exists():
+            print(f"Error: File '{path}' does not exist.")
+            sys.exit(1)
 
     if not args.key:
         print("Error: API Key is required. Set ADMIN_API_KEY env var or use --key.")
         sys.exit(1)
 
+    if httpx is None and requests is None:
+        print("Error: install httpx (preferred) or requests to upload.")
+        sys.exit(1)
+
     url = f"{args.url.rstrip('/')}/ingest/upload"
     headers = {"Authorization": f"Bearer {args.key}"}
     params = {"source": args.source}
 
-    print(f"Uploading {args.file.name} to {url}...")
+    if httpx is not None:
+        ok = asyncio.run(_upload_all_async(args.file, url, headers, params))
+    else:
+        ok = all([_upload_one(path, url, headers, params) for path in args.file])
 
-    try:
-        with open(args.file, "rb") as f:
-            files = {"file": (args.file.name, f, "application/zip")}
-            response = requests.post(url, headers=headers, params=params, files=files)
-
-        if response.status_code == 200:
-            data = response.json()
-            print(f"Success: {data.get('message', 'Upload accepted')}")
-        else:
-            print(f"Failed (HTTP {response.status_code}): {response.text}")
-            sys.exit(1)
-
-    except requests.RequestException as e:
-        print(f"Network error: {e}")
+    if not ok:
         sys.exit(1)
 
 